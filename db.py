@@ -1,16 +1,27 @@
 from __future__ import annotations
 import sqlite3
+import threading
 from datetime import datetime, date
 from typing import Iterable, Optional
 
-SCHEMA = """
+import pandas as pd
+
+# Se aplican una sola vez sobre la conexión persistente
+PRAGMAS = """
 PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-20000;
+"""
+
+SCHEMA = """
 CREATE TABLE IF NOT EXISTS post_history (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   youtube_url TEXT NOT NULL,
   posted_at TEXT NOT NULL
 );
-CREATE INDEX IF NOT EXISTS idx_history_url ON post_history(youtube_url);
+CREATE INDEX IF NOT EXISTS idx_history_url_posted ON post_history(youtube_url, posted_at);
 CREATE INDEX IF NOT EXISTS idx_history_posted_at ON post_history(posted_at);
 
 CREATE TABLE IF NOT EXISTS daily_queue (
@@ -22,24 +33,52 @@ CREATE TABLE IF NOT EXISTS daily_queue (
   status TEXT NOT NULL DEFAULT 'pending',
   UNIQUE(run_date, slot_index)
 );
+
+CREATE TABLE IF NOT EXISTS post_state (
+  youtube_url TEXT PRIMARY KEY,
+  posted INTEGER NOT NULL DEFAULT 0,
+  last_posted_at TEXT
+);
 """
 
 class DB:
     def __init__(self, path: str = "xbot.db"):
         self.path = path
+        # Conexión única en autocommit; las escrituras se serializan con el lock
+        self.con = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._write_lock = threading.Lock()
         self._ensure()
 
     def _ensure(self):
-        with sqlite3.connect(self.path) as con:
-            con.executescript(SCHEMA)
+        self.con.executescript(PRAGMAS)
+        self.con.executescript(SCHEMA)
+        # Migración: idx_history_url queda cubierto por idx_history_url_posted
+        self.con.execute("DROP INDEX IF EXISTS idx_history_url")
+
+    def close(self):
+        with self._write_lock:
+            self.con.close()
 
     # ---- Historial de publicaciones ----
     def add_history(self, youtube_url: str, when: datetime):
-        with sqlite3.connect(self.path) as con:
-            con.execute(
-                "INSERT INTO post_history(youtube_url, posted_at) VALUES (?, ?)",
-                (youtube_url, when.isoformat())
-            )
+        self.add_history_many([(youtube_url, when)])
+
+    def add_history_many(self, items: Iterable[tuple[str, datetime]]):
+        """Inserta varias entradas en una sola transacción (un único commit)."""
+        rows = [(url, when.isoformat()) for url, when in items]
+        if not rows:
+            return
+        with self._write_lock:
+            self.con.execute("BEGIN")
+            try:
+                self.con.executemany(
+                    "INSERT INTO post_history(youtube_url, posted_at) VALUES (?, ?)",
+                    rows
+                )
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+            self.con.execute("COMMIT")
 
     def posted_in_last_days(self, urls: Iterable[str], days: int) -> set[str]:
         urls = [u for u in urls if u]
@@ -47,19 +86,29 @@ class DB:
             return set()
         since_ts = datetime.now().timestamp() - days * 86400
         since_iso = datetime.fromtimestamp(since_ts).isoformat()
-        placeholders = ",".join("?" for _ in urls)
-        q = (
-            f"SELECT DISTINCT youtube_url FROM post_history "
-            f"WHERE youtube_url IN ({placeholders}) AND posted_at >= ?"
-        )
-        with sqlite3.connect(self.path) as con:
-            rows = con.execute(q, [*urls, since_iso]).fetchall()
+        # Tabla temporal en vez de un IN (?,?,...) variable: el texto de la consulta es siempre el mismo.
+        # Con IN (SELECT ...) el planner busca cada URL en idx_history_url_posted (SEARCH);
+        # un JOIN contra _urls acaba recorriendo todo el historial (SCAN).
+        # La tabla es de la conexión compartida, así que va bajo el lock.
+        with self._write_lock:
+            self.con.execute("CREATE TEMP TABLE IF NOT EXISTS _urls(u TEXT PRIMARY KEY)")
+            self.con.execute("BEGIN")
+            try:
+                self.con.execute("DELETE FROM _urls")
+                self.con.executemany("INSERT OR IGNORE INTO _urls VALUES (?)", [(u,) for u in urls])
+                rows = self.con.execute(
+                    "SELECT DISTINCT youtube_url FROM post_history "
+                    "WHERE youtube_url IN (SELECT u FROM _urls) AND posted_at >= ?",
+                    (since_iso,)
+                ).fetchall()
+            finally:
+                self.con.execute("COMMIT")
         return {r[0] for r in rows}
 
     # ---- Cola diaria (slots) ----
     def upsert_queue_item(self, run_date: date, slot_index: int, youtube_url: str, planned_at: Optional[datetime]):
-        with sqlite3.connect(self.path) as con:
-            con.execute(
+        with self._write_lock:
+            self.con.execute(
                 "INSERT INTO daily_queue(run_date, slot_index, youtube_url, planned_at, status) "
                 "VALUES (?, ?, ?, ?, 'pending') "
                 "ON CONFLICT(run_date, slot_index) DO UPDATE SET "
@@ -68,37 +117,53 @@ class DB:
             )
 
     def get_queue_for_date(self, run_date: date):
-        with sqlite3.connect(self.path) as con:
-            rows = con.execute(
-                "SELECT slot_index, youtube_url, status FROM daily_queue "
-                "WHERE run_date=? ORDER BY slot_index",
-                (run_date.isoformat(),)
-            ).fetchall()
+        rows = self.con.execute(
+            "SELECT slot_index, youtube_url, status FROM daily_queue "
+            "WHERE run_date=? ORDER BY slot_index",
+            (run_date.isoformat(),)
+        ).fetchall()
         return rows
 
+    def get_queue_df_for_date(self, run_date: date) -> pd.DataFrame:
+        """Igual que get_queue_for_date pero materializado directamente en columnas."""
+        return pd.read_sql_query(
+            "SELECT slot_index, youtube_url, status FROM daily_queue "
+            "WHERE run_date=? ORDER BY slot_index",
+            self.con,
+            params=(run_date.isoformat(),)
+        )
+
     def claim_queue_item(self, run_date: date, slot_index: int) -> Optional[str]:
-        with sqlite3.connect(self.path) as con:
-            cur = con.cursor()
-            cur.execute(
-                "SELECT youtube_url FROM daily_queue "
-                "WHERE run_date=? AND slot_index=? AND status='pending'",
-                (run_date.isoformat(), slot_index)
-            )
-            row = cur.fetchone()
-            if not row:
-                return None
-            cur.execute(
+        # Un único UPDATE ... RETURNING: reclamar es atómico aunque scheduler y /post-now compitan
+        with self._write_lock:
+            row = self.con.execute(
                 "UPDATE daily_queue SET status='posting' "
-                "WHERE run_date=? AND slot_index=?",
+                "WHERE run_date=? AND slot_index=? AND status='pending' "
+                "RETURNING youtube_url",
                 (run_date.isoformat(), slot_index)
-            )
-            con.commit()
-            return row[0]
+            ).fetchone()
+        return row[0] if row else None
 
     def finish_queue_item(self, run_date: date, slot_index: int, status: str):
-        with sqlite3.connect(self.path) as con:
-            con.execute(
+        with self._write_lock:
+            self.con.execute(
                 "UPDATE daily_queue SET status=? "
                 "WHERE run_date=? AND slot_index=?",
                 (status, run_date.isoformat(), slot_index)
             )
+
+    # ---- Estado de publicación (sidecar del Excel) ----
+    def upsert_post_state(self, youtube_url: str, when: datetime):
+        with self._write_lock:
+            self.con.execute(
+                "INSERT INTO post_state(youtube_url, posted, last_posted_at) VALUES (?, 1, ?) "
+                "ON CONFLICT(youtube_url) DO UPDATE SET "
+                "posted=1, last_posted_at=excluded.last_posted_at",
+                (youtube_url, when.isoformat())
+            )
+
+    def get_post_state(self) -> list[tuple[str, bool, Optional[str]]]:
+        rows = self.con.execute(
+            "SELECT youtube_url, posted, last_posted_at FROM post_state"
+        ).fetchall()
+        return [(url, bool(posted), last) for url, posted, last in rows]
@@ -1,9 +1,11 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, timezone, time
 from pathlib import Path
 from typing import Optional
-from utils import is_valid_youtube, log
+from db import DB
+from utils import EXCEL_READ_ENGINE, YT_URL_PREFIXES, is_valid_youtube, log
 from settings import settings
 import random
 
@@ -21,20 +23,52 @@ REQUIRED_COLUMNS = [
     "Posted", "LastPostedAt", "Notes"
 ]
 
+# Columnas auxiliares (epoch en segundos, int64) para filtrar con comparaciones enteras.
+# No se exportan al Excel.
+EPOCH_COLUMNS = {"ReleaseDate": "_release_epoch", "LastPostedAt": "_last_posted_epoch"}
+
+def _epoch_seconds(col: pd.Series) -> pd.Series:
+    """datetime64 -> int64 en segundos. NaT queda muy negativo, así que nunca supera un corte real."""
+    return pd.Series(col.array.asi8 // 10**9, index=col.index)
+
 class ExcelManager:
-    def __init__(self, path: str | Path | None = None, sheet: str | None = None):
+    # Caché compartida entre instancias: (ruta, hoja) -> (mtime_ns, DataFrame ya normalizado)
+    _cache: dict[tuple[str, str], tuple[int, pd.DataFrame]] = {}
+
+    def __init__(self, path: str | Path | None = None, sheet: str | None = None, db: DB | None = None):
         self.path = Path(path or settings.EXCEL_PATH)
         self.sheet = sheet or getattr(settings, "EXCEL_SHEET", "Tracks")
+        # Posted/LastPostedAt viven en SQLite (settings.DB_PATH); el XLSX sólo se reescribe con export_xlsx().
+        # Si no se pasa db, la conexión se abre al primer uso (ver la propiedad db)
+        self._db = db
         self.df: Optional[pd.DataFrame] = None
 
+    @property
+    def db(self) -> DB:
+        if self._db is None:
+            db_path = Path(settings.DB_PATH)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = DB(str(db_path))
+        return self._db
+
     # ---------- IO ----------
     def load(self) -> pd.DataFrame:
         """Lee el Excel y normaliza columnas/tipos."""
         if not self.path.exists():
             raise FileNotFoundError(f"Excel no encontrado en {self.path}")
 
+        # Si el fichero no ha cambiado desde la última lectura, evitamos re-parsear el XLSX.
+        # Copia profunda porque mark_posted() modifica self.df in-place.
+        key = (str(self.path), self.sheet)
+        mtime_ns = self.path.stat().st_mtime_ns
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            self.df = self._add_epoch_columns(self._apply_post_state(cached[1].copy()))
+            log(event="excel_cache_hit", rows=int(len(self.df)), path=str(self.path), sheet=self.sheet)
+            return self.df
+
         # Cargamos todo como string para limpiar, y luego casteamos fechas
-        df = pd.read_excel(self.path, sheet_name=self.sheet, dtype=str)
+        df = pd.read_excel(self.path, sheet_name=self.sheet, dtype=str, engine=EXCEL_READ_ENGINE)
 
         # Soportar nombre alternativo de fecha
         if "ReleaseDate" not in df.columns and "ReleaseDate (YYYY-MM-DD)" in df.columns:
@@ -63,31 +97,59 @@ class ExcelManager:
             df["Posted"] = False
         df["Posted"] = df["Posted"].fillna(False).astype(bool)
 
-        self.df = df
+        self._cache[key] = (mtime_ns, df.copy())
+        self.df = self._add_epoch_columns(self._apply_post_state(df))
         log(event="excel_loaded", rows=int(len(df)), path=str(self.path), sheet=self.sheet)
+        return self.df
+
+    def _apply_post_state(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Superpone el estado guardado en SQLite (por YouTubeURL) sobre lo leído del Excel."""
+        rows = self.db.get_post_state()
+        if not rows:
+            return df
+        state = pd.DataFrame(rows, columns=["YouTubeURL", "Posted", "LastPostedAt"]).set_index("YouTubeURL")
+        # format="ISO8601": isoformat() omite los microsegundos cuando son 0, así que las filas
+        # mezclan formas; sin esto pandas infiere el formato de la primera y el resto queda NaT
+        state_last = pd.to_datetime(state["LastPostedAt"], errors="coerce", utc=True, format="ISO8601")
+
+        df["Posted"] = df["Posted"] | df["YouTubeURL"].map(state["Posted"]).eq(True)
+        df["LastPostedAt"] = df["YouTubeURL"].map(state_last).combine_first(df["LastPostedAt"])
+        return df
+
+    @staticmethod
+    def _add_epoch_columns(df: pd.DataFrame) -> pd.DataFrame:
+        for src, dst in EPOCH_COLUMNS.items():
+            df[dst] = _epoch_seconds(df[src])
         return df
 
-    def save(self):
-        """Escribe el DataFrame de vuelta al Excel."""
+    def export_xlsx(self):
+        """Escribe el DataFrame (con el estado actual) de vuelta al Excel. Sólo bajo petición explícita."""
         assert self.df is not None, "Debes llamar load() primero"
         # Guardamos. openpyxl mantiene formato básico.
+        out = self.df.drop(columns=list(EPOCH_COLUMNS.values()))
+        # Excel no admite datetimes con tz: LastPostedAt se escribe en UTC sin tz
+        out["LastPostedAt"] = out["LastPostedAt"].dt.tz_localize(None)
         with pd.ExcelWriter(self.path, engine="openpyxl", mode="w") as writer:
-            self.df.to_excel(writer, sheet_name=self.sheet, index=False)
+            out.to_excel(writer, sheet_name=self.sheet, index=False)
         log(event="excel_saved", rows=int(len(self.df)), path=str(self.path), sheet=self.sheet)
 
+    # Compatibilidad con el nombre anterior
+    save = export_xlsx
+
     # ---------- Validación / Estado ----------
     def validate_row(self, row) -> bool:
         """Fila válida: URL de YouTube válida + fecha válida."""
         return is_valid_youtube(row["YouTubeURL"]) and pd.notnull(row["ReleaseDate"])
 
     def mark_posted(self, row_idx: int, when: datetime):
-        """Marca la fila como publicada y guarda el Excel."""
+        """Marca la fila como publicada y persiste el estado en SQLite (sin reescribir el Excel)."""
         assert self.df is not None, "Debes llamar load() primero"
         # Forzamos UTC en LastPostedAt
         when_utc = when.astimezone(UTC) if when.tzinfo else when.replace(tzinfo=UTC)
-        self.df.loc[row_idx, "Posted"] = True
-        self.df.loc[row_idx, "LastPostedAt"] = when_utc
-        self.save()
+        self.df.at[row_idx, "Posted"] = True
+        self.df.at[row_idx, "LastPostedAt"] = when_utc
+        self.df.at[row_idx, "_last_posted_epoch"] = int(when_utc.timestamp())
+        self.db.upsert_post_state(self.df.at[row_idx, "YouTubeURL"], when_utc)
 
     # ---------- Selección (cooldown + prioridad) ----------
     @staticmethod
@@ -104,27 +166,22 @@ class ExcelManager:
         - Deduplica por YouTubeURL quedándose con la más reciente (por ReleaseDate).
         """
         assert self.df is not None, "Debes llamar load() primero"
-        df = self.df.copy()
-
-        # Normalización de tipos mínimos
-        df["LastPostedAt"] = pd.to_datetime(df.get("LastPostedAt"), errors="coerce", utc=True)
-        df["ReleaseDate"] = pd.to_datetime(df.get("ReleaseDate"), errors="coerce")  # naive
+        df = self.df
 
-        # Filtro cooldown
-        cutoff = self._cooldown_cutoff(now_utc)
-        recent_block = df["LastPostedAt"].notna() & (df["LastPostedAt"] >= cutoff)
-        pool = df[~recent_block].copy()
+        # Filtro cooldown: comparación int64 contra un único escalar (NaT nunca bloquea)
+        cutoff_epoch = int(self._cooldown_cutoff(now_utc).timestamp())
+        recent_block = df["_last_posted_epoch"] >= cutoff_epoch
 
-        # Validaciones mínimas
-        pool = pool[pd.notnull(pool["ReleaseDate"]) & pool["YouTubeURL"].astype(str).str.len().gt(0)]
-        pool = pool[pool["YouTubeURL"].apply(is_valid_youtube)]
+        # Validaciones mínimas (vectorizadas: sin apply por fila)
+        urls = df["YouTubeURL"].astype("string").str.lower()
+        valid_url = urls.str.startswith(YT_URL_PREFIXES).fillna(False)
 
-        # Deduplicar por URL (elige la más reciente por ReleaseDate)
-        pool.sort_values(by=["ReleaseDate"], ascending=False, inplace=True, kind="stable")
-        pool = pool.drop_duplicates(subset=["YouTubeURL"], keep="first")
+        # Una sola selección con la máscara combinada (sin copiar antes el DataFrame)
+        pool = df.loc[~recent_block & df["ReleaseDate"].notna() & valid_url]
 
-        pool.reset_index(drop=True, inplace=True)
-        return pool
+        # Deduplicar por URL (elige la más reciente por ReleaseDate): un groupby hash O(N), sin ordenar
+        idx = pool.groupby("YouTubeURL", sort=False)["ReleaseDate"].idxmax()
+        return pool.loc[idx].reset_index(drop=True)
 
     def pick_daily_set(self, now_local: datetime, now_utc: datetime, k: int = 5) -> pd.DataFrame:
         """
@@ -138,28 +195,23 @@ class ExcelManager:
         today = now_local.date()
         recent_cut = today - timedelta(days=RECENT_WINDOW_DAYS)
 
-        # ReleaseDate podría venir con hora; pasamos a date
-        pool["ReleaseDateDate"] = pd.to_datetime(pool["ReleaseDate"], errors="coerce").dt.date
-
-        recent = pool[pool["ReleaseDateDate"] >= recent_cut].copy()
-        backcat = pool[pool["ReleaseDateDate"] < recent_cut].copy()
-
-        # Mezcla aleatoria sin random_state fijo
-        if len(recent):
-            recent = recent.sample(frac=1)
-        if len(backcat):
-            backcat = backcat.sample(frac=1)
-
-        chosen = pd.concat([recent, backcat], axis=0).head(k).copy()
-
-        # Si faltan, rellena desde el pool (sin violar cooldown y sin repetir URL)
-        if len(chosen) < k:
-            extra = pool[~pool["YouTubeURL"].isin(chosen["YouTubeURL"])].sample(frac=1)
-            needed = k - len(chosen)
-            chosen = pd.concat([chosen, extra.head(needed)], axis=0)
-
-        chosen.reset_index(drop=True, inplace=True)
-        return chosen
+        # ReleaseDate podría venir con hora: "día >= recent_cut" equivale a "epoch >= medianoche de recent_cut"
+        recent_cut_epoch = np.datetime64(recent_cut, "s").astype(np.int64)
+        is_recent = pool["_release_epoch"].to_numpy() >= recent_cut_epoch
+
+        # Selección aleatoria sin random_state fijo: se sortean sólo las k posiciones necesarias
+        # (primero recientes, luego back-catalog), sin barajar todo el pool
+        rng = np.random.default_rng()
+        recent_pos = np.flatnonzero(is_recent)
+        backcat_pos = np.flatnonzero(~is_recent)
+        picked = rng.choice(recent_pos, size=min(k, len(recent_pos)), replace=False)
+        needed = k - len(picked)
+        picked = np.concatenate([picked, rng.choice(backcat_pos, size=min(needed, len(backcat_pos)), replace=False)])
+
+        # Recientes + back-catalog cubren todo el pool: si faltan filas es que el pool no da para más,
+        # así que no hace falta un segundo pase de relleno (el pool ya respeta cooldown y URL única)
+        chosen = pool.iloc[picked]
+        return chosen.reset_index(drop=True)
 
     # ---------- Utilidades opcionales ----------
     @staticmethod
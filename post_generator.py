@@ -1,8 +1,9 @@
 # post_generator.py
 from __future__ import annotations
 
+import re
 from datetime import datetime
-from urllib.parse import urlencode, urlparse, urlunparse, parse_qsl
+from urllib.parse import quote_plus, urlencode, urlparse, urlunparse, parse_qsl
 
 from settings import settings
 
@@ -13,13 +14,30 @@ PLATFORM_TAGS = {
     "AppleMusic": ["#TechHouse", "#AppleMusic", "#NewRelease"],
     "Spotify":    ["#TechHouse", "#Spotify", "#NowPlaying"],
 }
+DEFAULT_TAGS = ["#TechHouse", "#NewMusic"]
+
+# Cadenas ya unidas (se calculan una vez al importar)
+PLATFORM_TAGS_JOINED = {k: " ".join(v) for k, v in PLATFORM_TAGS.items()}
+PLATFORM_TAGS_SHORT = {k: v[0] for k, v in PLATFORM_TAGS.items()}
+DEFAULT_TAGS_JOINED = " ".join(DEFAULT_TAGS)
+DEFAULT_TAGS_SHORT = DEFAULT_TAGS[0]
+
+# Cualquier carácter no alfanumérico (incluido "_") -> "-", uno a uno
+_SLUG_NON_ALNUM = re.compile(r"[\W_]")
 
 def _slug(s: str) -> str:
-    return "".join(c.lower() if c.isalnum() else "-" for c in (s or ""))[:60].strip("-")
+    return _SLUG_NON_ALNUM.sub("-", (s or "").lower())[:60].strip("-")
 
 def _add_utm(url: str, campaign: str) -> str:
     if not settings.USE_UTM:
         return url
+    # Caso común (sin query ni fragmento): basta con concatenar
+    if "?" not in url and "#" not in url:
+        return (
+            f"{url}?utm_source={quote_plus(settings.UTM_SOURCE)}"
+            f"&utm_medium={quote_plus(settings.UTM_MEDIUM)}"
+            f"&utm_campaign={quote_plus(campaign)}"
+        )
     u = urlparse(url)
     q = dict(parse_qsl(u.query))
     q.update({
@@ -40,27 +58,24 @@ def build_copy(title: str, artist: str | None, lang: str | None, release_dt, pla
     base_info = f"{title}{artist_part} · {date_str}".strip()
 
     # 3) Hashtags por plataforma
-    tags = " ".join(PLATFORM_TAGS.get(platform, ["#TechHouse", "#NewMusic"]))
+    tags = PLATFORM_TAGS_JOINED.get(platform, DEFAULT_TAGS_JOINED)
 
     # 4) Enlace con UTM opcional
     campaign = f"{_slug(title)}-{platform.lower()}"
     final_url = _add_utm(url, campaign)
 
-    copy = f"{headline}\n{base_info}\n{tags}\n{final_url}"
-
-    # Asegurar <= 280 caracteres (prioriza headline + link)
-    if len(copy) > 280:
-        reserved = len(headline) + len(tags) + len(final_url) + 3
-        max_base = max(10, 280 - reserved)
+    # Asegurar <= 280 caracteres (prioriza headline + link).
+    # Se mide con longitudes y se ensambla el texto una sola vez.
+    fixed_len = len(headline) + len(final_url) + 3  # 3 saltos de línea
+    if fixed_len + len(base_info) + len(tags) > 280:
+        max_base = max(10, 280 - fixed_len - len(tags))
         if len(base_info) > max_base:
             base_info = base_info[:max_base - 1] + "…"
-        copy = f"{headline}\n{base_info}\n{tags}\n{final_url}"
-    if len(copy) > 280:
-        short_tags = " ".join(PLATFORM_TAGS.get(platform, ["#TechHouse"])[:1])
-        copy = f"{headline}\n{base_info}\n{short_tags}\n{final_url}"
-    if len(copy) > 280:
-        copy = f"{headline}\n{base_info}\n{final_url}"
+        if fixed_len + len(base_info) + len(tags) > 280:
+            tags = PLATFORM_TAGS_SHORT.get(platform, DEFAULT_TAGS_SHORT)
+        if fixed_len + len(base_info) + len(tags) > 280:
+            return f"{headline}\n{base_info}\n{final_url}"
 
-    return copy
+    return f"{headline}\n{base_info}\n{tags}\n{final_url}"
 # Compatibilidad con versiones anteriores del scheduler
 build_post = build_copy
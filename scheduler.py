@@ -2,22 +2,35 @@
 from __future__ import annotations
 
 import logging
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Tuple
 
+import numpy as np
 import pandas as pd
+from apscheduler.executors.pool import ThreadPoolExecutor as JobThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from zoneinfo import ZoneInfo
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
 
 from settings import settings
+from utils import EXCEL_READ_ENGINE, HAS_XLSXWRITER
 from post_generator import build_post   # alias a build_copy
 from x_client import XClient
 
 logger = logging.getLogger("xbot")
 
+# Lectura en streaming (ReadOnlyWorksheet), sin fórmulas ni enlaces externos
+_OPENPYXL_READ_KWARGS = {"read_only": True, "data_only": True, "keep_links": False}
+
+# Un único worker: las escrituras del Excel se serializan fuera del hilo que publica
+_WRITE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xbot-excel-writer")
+
 
 # ---------------------------
 # Helpers horario
@@ -39,6 +52,38 @@ def _parse_slot_to_hm(slot: str) -> Tuple[int, int]:
     return h, m
 
 
+def _excel_value(v):
+    """Valor apto para una celda de openpyxl: NaN/NaT -> vacío y datetimes sin tz (Excel no soporta tz)."""
+    if v is None or v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    if isinstance(v, pd.Timestamp):
+        v = v.to_pydatetime()
+    if isinstance(v, datetime) and v.tzinfo is not None:
+        return v.replace(tzinfo=None)
+    return v
+
+
+def _excel_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia del DataFrame con las columnas datetime sin tz (Excel no soporta tz)."""
+    out = df.copy(deep=False)
+    for col in out.select_dtypes(include="datetimetz").columns:
+        out[col] = out[col].dt.tz_localize(None)
+    return out
+
+
+def _optional_str(col: pd.Series) -> pd.Series:
+    """Texto de la celda o None si está vacía (NaN/None)."""
+    return col.astype(str).astype(object).where(col.notna(), None)
+
+
+def _py_datetimes(col: pd.Series) -> np.ndarray:
+    """Columna datetime64 -> array object de datetime de Python, con None en lugar de NaT."""
+    values = pd.to_datetime(col, errors="coerce").array
+    return np.where(values.isna(), None, values.to_pydatetime())
+
+
 # ---------------------------
 # Estructura de candidato
 # ---------------------------
@@ -63,10 +108,20 @@ class Candidate:
 # ---------------------------
 class BotScheduler:
     def __init__(self) -> None:
-        self.scheduler = BackgroundScheduler(timezone=ZoneInfo(settings.TZ))
         self.tz = ZoneInfo(settings.TZ)
+        self.scheduler = BackgroundScheduler(
+            timezone=self.tz,
+            # Un único hilo para todos los slots: los jobs son pocos y no deben solaparse
+            executors={"default": JobThreadPoolExecutor(max_workers=1)},
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 30 * 60},
+        )
         self.jitter_seconds = int(getattr(settings, "SLOT_JITTER_MINUTES", 15)) * 60
 
+        # Cliente de X reutilizado entre slots (mantiene la conexión HTTP viva).
+        # Las publicaciones se serializan: cron y /post-now pueden coincidir.
+        self.client = XClient()
+        self._post_lock = threading.Lock()
+
         # Mapa columnas por plataforma
         self.platform_cols: Dict[str, Dict[str, str]] = {
             "YouTube":    {"url": "YouTubeURL",    "posted": "PostedYouTube",    "last": "LastPostedYouTubeAt"},
@@ -79,6 +134,12 @@ class BotScheduler:
         self._today_cache_date: Optional[str] = None  # "YYYY-MM-DD" en TZ del bot
         self._today_cache_by_platform: Dict[str, set] = {p: set() for p in self.platform_cols.keys()}
 
+        # Última escritura del Excel encolada en _WRITE_EXECUTOR
+        self._pending_save: Optional[Future] = None
+
+        # DataFrame ya normalizado, con la clave (mtime_ns, tamaño) del fichero del que salió
+        self._df_cache: Optional[Tuple[Tuple[int, int], pd.DataFrame]] = None
+
     # ---- Arranque del scheduler
     def start(self) -> None:
         # Programa un job por cada slot
@@ -89,71 +150,81 @@ class BotScheduler:
                 self.run_once,
                 trigger=trig,
                 id=f"slot-{i}",
-                coalesce=True,
-                max_instances=1,
-                misfire_grace_time=30 * 60,
                 jitter=self.jitter_seconds,  # retraso aleatorio 0..jitter
             )
             logger.info({"event": "slot_scheduled", "slot": slot, "id": f"slot-{i}", "jitter_sec": self.jitter_seconds})
         self.scheduler.start()
         logger.info({"event": "scheduler_started", "tz": str(self.tz)})
 
+    # ---- Parada ordenada (no deja escrituras del Excel a medias)
+    def stop(self) -> None:
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        self._wait_pending_save()
+        logger.info({"event": "scheduler_stopped"})
+
     # ---- Lanza un post ahora (usado por el endpoint opcional)
     def post_job_with_jitter(self, force_no_jitter: bool = True) -> None:
         # Ejecutamos directo; el jitter ya se aplica sólo en cron.
         self.run_once()
 
+    # ---- Publicación inmediata (endpoint /post-now)
+    def post_one(self, slot_index: int = 0) -> None:
+        logger.info({"event": "post_now", "slot_index": slot_index})
+        self.run_once()
+
     # ---- Job principal (una publicación)
     def run_once(self) -> None:
-        now = datetime.now(self.tz)
         try:
-            self._ensure_today_cache(now)
-            logger.info({"event": "job_start", "ts": now.isoformat()})
-            df = self._load_tracks_df()
-            if df is None or df.empty:
-                logger.warning({"event": "no_data"})
-                return
-
-            candidates = self._explode_candidates(df, now)
-            if not candidates:
-                logger.warning({"event": "no_candidates"})
-                return
-
-            cand = self._pick_candidate(candidates, now)
-            if not cand:
-                logger.warning({"event": "no_candidate_after_filters"})
-                return
-
-            # Generar copy
-            text = build_post(
-                title=cand.title,
-                artist=cand.artist,
-                lang=cand.lang,
-                release_dt=cand.release_dt,
-                platform=cand.platform,
-                url=cand.url,
-            )
+            # Un ciclo completo a la vez (elegir, publicar, marcar): un slot del cron y /post-now
+            # no pueden elegir el mismo candidato ni pisarse la marca en el Excel
+            with self._post_lock:
+                now = datetime.now(self.tz)
+                self._ensure_today_cache(now)
+                logger.info({"event": "job_start", "ts": now.isoformat()})
+                df = self._load_tracks_df()
+                if df is None or df.empty:
+                    logger.warning({"event": "no_data"})
+                    return
+
+                candidates = self._explode_candidates(df, now)
+                if not candidates:
+                    logger.warning({"event": "no_candidates"})
+                    return
+
+                cand = self._pick_candidate(candidates, now)
+                if not cand:
+                    logger.warning({"event": "no_candidate_after_filters"})
+                    return
+
+                # Generar copy
+                text = build_post(
+                    title=cand.title,
+                    artist=cand.artist,
+                    lang=cand.lang,
+                    release_dt=cand.release_dt,
+                    platform=cand.platform,
+                    url=cand.url,
+                )
 
-            # Publicar
-            x = XClient()
-            media_ids = x.prepare_thumbnail_if_enabled(cand.url, cand.platform)
-            resp = x.post_text(text, media_ids=media_ids)
+                # Publicar (la miniatura se prepara durante la espera previa)
+                resp = self.client.publish(text, cand.url, cand.platform)
 
-            logger.info({
-                "event": "post_done",
-                "platform": cand.platform,
-                "url": cand.url,
-                "dry_run": settings.DRY_RUN,
-                "resp": resp,
-            })
+                logger.info({
+                    "event": "post_done",
+                    "platform": cand.platform,
+                    "url": cand.url,
+                    "dry_run": settings.DRY_RUN,
+                    "resp": resp,
+                })
 
-            # Persistencia (si NO es dry-run)
-            if not settings.DRY_RUN:
-                self._mark_posted(df, cand, now)
-                self._save_tracks_df(df)
+                # Persistencia (si NO es dry-run)
+                if not settings.DRY_RUN:
+                    self._mark_posted(df, cand, now)
+                    self._save_tracks_df_async(df)
 
-            # Evita que este URL se vuelva a elegir hoy en siguientes slots
-            self._today_cache_by_platform.get(cand.platform, set()).add(cand.url.strip())
+                # Evita que este URL se vuelva a elegir hoy en siguientes slots
+                self._today_cache_by_platform.get(cand.platform, set()).add(cand.url.strip())
 
         except Exception as e:
             logger.exception({"event": "job_exception", "error": str(e)})
@@ -164,8 +235,16 @@ class BotScheduler:
     # Excel helpers
     # ---------------------------
     def _load_tracks_df(self) -> Optional[pd.DataFrame]:
+        # No leer mientras haya una escritura pendiente del Excel
+        self._wait_pending_save()
         try:
-            df = pd.read_excel(settings.EXCEL_PATH, sheet_name=getattr(settings, "EXCEL_SHEET", "Tracks"))
+            st = os.stat(settings.EXCEL_PATH)
+            # Si el fichero no cambió desde la última lectura, no se vuelve a parsear.
+            # Copia profunda porque run_once marca el DataFrame in-place.
+            key = (st.st_mtime_ns, st.st_size)
+            if self._df_cache is not None and self._df_cache[0] == key:
+                return self._df_cache[1].copy()
+            df = self._read_excel(settings.EXCEL_PATH, getattr(settings, "EXCEL_SHEET", "Tracks"))
         except FileNotFoundError:
             logger.error({"event": "excel_not_found", "path": settings.EXCEL_PATH})
             return None
@@ -173,60 +252,96 @@ class BotScheduler:
             logger.error({"event": "excel_read_error", "error": str(e)})
             return None
 
-        # Normaliza columnas básicas
+        # Normaliza columnas: básicas + las de cada plataforma, todas las que falten de una vez
         base_cols = ["Title", "Artist", "Language", "ReleaseDate"]
-        for c in base_cols:
-            if c not in df.columns:
-                df[c] = None
+        plat_cols = list(self.platform_cols.values())
+        needed = base_cols + [c for cols in plat_cols for c in cols.values()]
+        missing = [c for c in needed if c not in df.columns]
+        if missing:
+            df = df.reindex(columns=[*df.columns, *missing])
 
         # Fechas
-        if "ReleaseDate" in df.columns:
-            # A tz-aware en la TZ del bot para evitar comparaciones naive/aware
-            rdt = pd.to_datetime(df["ReleaseDate"], errors="coerce")
-            try:
-                rdt = rdt.dt.tz_localize(self.tz)  # si eran naive
-            except TypeError:
-                # si ya vienen con tz, sólo convertimos
-                rdt = rdt.dt.tz_convert(self.tz)
-            df["ReleaseDate"] = rdt
+        # A tz-aware en la TZ del bot para evitar comparaciones naive/aware
+        rdt = pd.to_datetime(df["ReleaseDate"], errors="coerce")
+        try:
+            rdt = rdt.dt.tz_localize(self.tz)  # si eran naive
+        except TypeError:
+            # si ya vienen con tz, sólo convertimos
+            rdt = rdt.dt.tz_convert(self.tz)
+        df["ReleaseDate"] = rdt
+
+        # Flags y fechas por plataforma
+        posted_cols = [cols["posted"] for cols in plat_cols]
+        posted = df[posted_cols]
+        df[posted_cols] = posted.notna() & posted.astype(bool)  # vacío -> False
+        # Guardamos naive en Excel, así que aquí lo dejamos naive
+        last_cols = [cols["last"] for cols in plat_cols]
+        df[last_cols] = df[last_cols].apply(pd.to_datetime, errors="coerce")
+
+        self._df_cache = (key, df.copy())
+        return df
 
-        # Flags por plataforma
-        for plat, cols in self.platform_cols.items():
-            if cols["url"] not in df.columns:
-                df[cols["url"]] = None
-            if cols["posted"] not in df.columns:
-                df[cols["posted"]] = False
-            if cols["last"] not in df.columns:
-                df[cols["last"]] = pd.NaT
-            else:
-                last = pd.to_datetime(df[cols["last"]], errors="coerce")
-                # Guardamos naive en Excel, así que aquí lo dejamos naive
-                df[cols["last"]] = last
+    @staticmethod
+    def _read_excel(path: str, sheet: str) -> pd.DataFrame:
+        # calamine si está instalado (sólo necesitamos valores); si no, openpyxl en streaming
+        if EXCEL_READ_ENGINE == "calamine":
+            return pd.read_excel(path, sheet_name=sheet, engine="calamine")
+        return pd.read_excel(path, sheet_name=sheet, engine="openpyxl", engine_kwargs=_OPENPYXL_READ_KWARGS)
 
-        return df
+    def _save_tracks_df_async(self, df: pd.DataFrame) -> None:
+        """Encola la escritura del Excel; el job termina sin esperar al disco."""
+        self._pending_save = _WRITE_EXECUTOR.submit(self._save_tracks_df, df)
+
+    def _wait_pending_save(self) -> None:
+        fut = self._pending_save
+        if fut is not None:
+            fut.result()  # _save_tracks_df ya registra sus propios errores
+            self._pending_save = None
 
     def _save_tracks_df(self, df: pd.DataFrame) -> None:
         path = settings.EXCEL_PATH
         sheet = getattr(settings, "EXCEL_SHEET", "Tracks")
+        self._df_cache = None
 
         try:
+            try:
+                ro = load_workbook(path, read_only=True)
+                sheetnames = ro.sheetnames
+                ro.close()
+            except FileNotFoundError:
+                sheetnames = []
+
+            # Sin otras hojas que preservar: reescritura completa con xlsxwriter (mucho más rápido)
+            if HAS_XLSXWRITER and sheetnames in ([], [sheet]):
+                with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+                    _excel_frame(df).to_excel(writer, sheet_name=sheet, index=False)
+                logger.info({"event": "excel_saved" if sheetnames else "excel_created", "path": path, "sheet": sheet})
+                return
+
+            header = [str(c) for c in df.columns]
+            if not sheetnames:
+                # Si no existía, crea el archivo en modo write-only (streaming)
+                wb = Workbook(write_only=True)
+                ws = wb.create_sheet(sheet)
+                ws.append(header)
+                for row in df.itertuples(index=False, name=None):
+                    ws.append([_excel_value(v) for v in row])
+                wb.save(path)
+                logger.info({"event": "excel_created", "path": path, "sheet": sheet})
+                return
+
             wb = load_workbook(path)
+            # Reemplaza la hoja en la misma posición, preservando las demás
+            pos = len(wb.sheetnames)
             if sheet in wb.sheetnames:
-                # Elimina la hoja para reemplazarla
-                ws = wb[sheet]
-                wb.remove(ws)
-            # Escribe preservando otras hojas
-            with pd.ExcelWriter(path, engine="openpyxl", mode="a") as writer:
-                writer.book = wb
-                writer.sheets = {ws.title: ws for ws in wb.worksheets}
-                df.to_excel(writer, sheet_name=sheet, index=False)
-                writer.save()
+                pos = wb.sheetnames.index(sheet)
+                wb.remove(wb[sheet])
+            ws = wb.create_sheet(sheet, pos)
+            ws.append(header)
+            for row in df.itertuples(index=False, name=None):
+                ws.append([_excel_value(v) for v in row])
+            wb.save(path)
             logger.info({"event": "excel_saved", "path": path, "sheet": sheet})
-        except FileNotFoundError:
-            # Si no existía, crea el archivo
-            with pd.ExcelWriter(path, engine="openpyxl") as writer:
-                df.to_excel(writer, sheet_name=sheet, index=False)
-            logger.info({"event": "excel_created", "path": path, "sheet": sheet})
         except Exception as e:
             logger.error({"event": "excel_write_error", "error": str(e)})
 
@@ -234,103 +349,88 @@ class BotScheduler:
     # Selección de candidato
     # ---------------------------
     def _explode_candidates(self, df: pd.DataFrame, now: datetime) -> List[Candidate]:
-        plats = settings.platforms  # lista desde PLATFORMS_ENABLED
-        out: List[Candidate] = []
+        # lista desde PLATFORMS_ENABLED (sólo las que conocemos)
+        plats = [p for p in settings.platforms if p in self.platform_cols]
         recent_cut = now - timedelta(days=int(getattr(settings, "RECENT_DAYS_PRIORITY", 60)))
+        if not plats or df.empty:
+            return []
+
+        # Columnas por fila, calculadas una vez para todo el DataFrame
+        base = pd.DataFrame({
+            "row_idx": df.index,
+            "title": df["Title"].fillna("").astype(str).str.strip(),
+            "artist": _optional_str(df["Artist"]),
+            "lang": _optional_str(df["Language"]),
+            "release_dt": df["ReleaseDate"],  # tz-aware en self.tz (ver _load_tracks_df)
+        }, index=df.index)
+
+        # Formato largo: una fila por (track, plataforma). melt apila columna a columna en el
+        # orden de value_vars, así que URLs y LastPosted*At quedan alineadas por posición.
+        url_cols = [self.platform_cols[p]["url"] for p in plats]
+        last_cols = [self.platform_cols[p]["last"] for p in plats]
+        long = base.join(df[url_cols]).melt(
+            id_vars=list(base.columns), value_vars=url_cols, var_name="url_col", value_name="url",
+        )
+        long["last_posted_at"] = df[last_cols].melt(value_vars=last_cols)["value"].to_numpy()
+
+        long["url"] = long["url"].astype("string").str.strip()
+        long = long[long["url"].notna() & long["url"].str.len().gt(0)]
+        if long.empty:
+            return []
+
+        # Deduplicar por URL dentro de cada plataforma, quedándonos con el más reciente por ReleaseDate
+        long = long.sort_values("release_dt", ascending=False, kind="stable", na_position="last")
+        long = long.drop_duplicates(subset=["url_col", "url"], keep="first")
+
+        blocked = self._compute_blocked_urls(df, now)
+        platform_by_url_col = dict(zip(url_cols, plats))
+        long["platform"] = long["url_col"].map(platform_by_url_col)
+        long["is_recent"] = (long["release_dt"] >= recent_cut).to_numpy()
+        # datetime de Python (o None) por columna entera, no con un Timestamp por celda
+        release_py = _py_datetimes(long["release_dt"])
+        last_py = _py_datetimes(long["last_posted_at"])
+
+        fields = ["row_idx", "platform", "url", "title", "artist", "lang", "is_recent"]
+        out: List[Candidate] = [
+            Candidate(
+                row_idx=row_idx,
+                platform=plat,
+                url_col=self.platform_cols[plat]["url"],
+                posted_col=self.platform_cols[plat]["posted"],
+                last_posted_col=self.platform_cols[plat]["last"],
+                url=url,
+                title=title,
+                artist=artist,
+                lang=lang,
+                release_dt=rdt,
+                last_posted_at=last,
+                is_recent=bool(is_recent),
+            )
+            for (row_idx, plat, url, title, artist, lang, is_recent), rdt, last
+            in zip(long[fields].itertuples(index=False, name=None), release_py, last_py)
+            # Filtro de cooldown por URL (no repetir el MISMO URL dentro de la ventana)
+            if url not in blocked[plat]
+        ]
 
-        for row_idx, row in df.iterrows():
-            title = str(row.get("Title") or "").strip()
-            artist = (str(row.get("Artist")) if pd.notna(row.get("Artist")) else None)
-            lang = (str(row.get("Language")) if pd.notna(row.get("Language")) else None)
-
-            rdt_ts = pd.to_datetime(row.get("ReleaseDate"), errors="coerce")
-            if pd.notna(rdt_ts):
-                try:
-                    if rdt_ts.tz is None:
-                        rdt_ts = rdt_ts.tz_localize(self.tz)
-                    else:
-                        rdt_ts = rdt_ts.tz_convert(self.tz)
-                except AttributeError:
-                    if rdt_ts.tzinfo is None:
-                        rdt_ts = rdt_ts.replace(tzinfo=self.tz)
-                rdt_dt: Optional[datetime] = rdt_ts.to_pydatetime()
-            else:
-                rdt_dt = None
-
-            for plat in plats:
-                if plat not in self.platform_cols:
-                    continue
-                cols = self.platform_cols[plat]
-                url = row.get(cols["url"])
-                if pd.isna(url) or not str(url).strip():
-                    continue
-
-                last_at = row.get(cols["last"])
-                last_dt = pd.to_datetime(last_at, errors="coerce")
-                last_dt = last_dt.to_pydatetime() if pd.notna(last_dt) else None
-
-                is_recent = (rdt_dt is not None and rdt_dt >= recent_cut)
-
-                cand = Candidate(
-                    row_idx=row_idx,
-                    platform=plat,
-                    url_col=cols["url"],
-                    posted_col=cols["posted"],
-                    last_posted_col=cols["last"],
-                    url=str(url).strip(),
-                    title=title,
-                    artist=artist,
-                    lang=lang,
-                    release_dt=rdt_dt,
-                    last_posted_at=last_dt,
-                    is_recent=is_recent,
-                )
-
-                # Filtro de cooldown por URL (no repetir el MISMO URL dentro de la ventana)
-                if self._is_url_in_cooldown(df, cand.url, plat, now):
-                    continue
-
-                out.append(cand)
-
-        if not out:
-            return out
-
-        # --- Deduplicar por URL dentro de cada plataforma, quedándonos con el más reciente por ReleaseDate ---
-        deduped: List[Candidate] = []
-        seen_per_plat: Dict[str, set] = {p: set() for p in self.platform_cols.keys()}
-        out.sort(key=lambda c: (c.release_dt or datetime(1970, 1, 1, tzinfo=self.tz)), reverse=True)
-        for c in out:
-            seen = seen_per_plat[c.platform]
-            if c.url in seen:
-                continue
-            seen.add(c.url)
-            deduped.append(c)
-
-        return deduped
+        return out
 
-    def _is_url_in_cooldown(self, df: pd.DataFrame, url: str, platform: str, now: datetime) -> bool:
-        cols = self.platform_cols[platform]
+    def _compute_blocked_urls(self, df: pd.DataFrame, now: datetime) -> Dict[str, set]:
+        """URLs bloqueadas por plataforma: publicadas hoy o dentro de la ventana de cooldown."""
         cooldown_days = int(getattr(settings, "COOLDOWN_DAYS_PER_URL", 30))
 
-        # 1) Bloqueo in-memory del día (antes de tocar Excel)
+        # 1) Bloqueo in-memory del día
         self._ensure_today_cache(now)
-        if url.strip() in self._today_cache_by_platform.get(platform, set()):
-            return True
 
         # 2) Bloqueo por Excel: compara con naive porque Excel se guarda naive
         now_local_naive = now.astimezone(self.tz).replace(tzinfo=None)
         cutoff_naive = now_local_naive - timedelta(days=cooldown_days)
 
-        mask = (df[cols["url"]].astype(str).str.strip() == url.strip())
-        if not mask.any():
-            return False
-
-        last_col = cols["last"]
-        recent = pd.to_datetime(df.loc[mask, last_col], errors="coerce")  # -> naive
-        if recent.notna().any() and (recent >= cutoff_naive).any():
-            return True
-
-        return False
+        blocked: Dict[str, set] = {}
+        for plat, cols in self.platform_cols.items():
+            last = pd.to_datetime(df[cols["last"]], errors="coerce")  # -> naive
+            recent_urls = df.loc[last >= cutoff_naive, cols["url"]].dropna().astype(str).str.strip()
+            blocked[plat] = set(recent_urls) | self._today_cache_by_platform.get(plat, set())
+        return blocked
 
     def _pick_candidate(self, candidates: List[Candidate], now: datetime) -> Optional[Candidate]:
         if not candidates:
@@ -341,17 +441,18 @@ class BotScheduler:
             rd = c.release_dt or datetime(1970, 1, 1, tzinfo=self.tz)
             return (0 if c.is_recent else 1, -rd.timestamp(), c.row_idx)
 
-        candidates.sort(key=sort_key)
-        return candidates[0]
+        # Sólo hace falta el primero: arg-min O(N) en vez de ordenar toda la lista
+        return min(candidates, key=sort_key)
 
     # ---------------------------
     # Persistencia tras publicar
     # ---------------------------
     def _mark_posted(self, df: pd.DataFrame, cand: Candidate, when: datetime) -> None:
-        df.loc[cand.row_idx, cand.posted_col] = True
+        # Escrituras escalares directas (posted_col ya es bool desde _load_tracks_df)
+        df.at[cand.row_idx, cand.posted_col] = True
         # Excel/openpyxl no soporta tz-aware: guardamos naive (sin tz)
         when_naive = when.replace(tzinfo=None)
-        df.loc[cand.row_idx, cand.last_posted_col] = when_naive
+        df.at[cand.row_idx, cand.last_posted_col] = when_naive
 
     # ---------------------------
     # Cache helpers
@@ -1,8 +1,15 @@
 # settings.py
 from __future__ import annotations
 
+from functools import lru_cache
 from pydantic import BaseSettings, Field
-from typing import List
+from typing import Tuple
+
+
+@lru_cache(maxsize=16)
+def _split_csv(value: str) -> Tuple[str, ...]:
+    """CSV -> tupla sin vacíos. Cacheado por valor: sólo se re-parsea si el CSV cambia."""
+    return tuple(s.strip() for s in value.split(",") if s.strip())
 
 
 class Settings(BaseSettings):
@@ -51,6 +58,9 @@ class Settings(BaseSettings):
     # ---------------------------
     EXCEL_PATH: str = Field(default="./data/tracks.xlsx")
     EXCEL_SHEET: str = Field(default="Tracks")
+    # Estado de publicación (SQLite). Es el único registro de lo publicado (el XLSX no se reescribe
+    # al marcar), así que debe vivir en un volumen persistente (ver docker-compose.yml)
+    DB_PATH: str = Field(default="./data/xbot.db")
 
     # ---------------------------
     # Miniatura opcional YouTube
@@ -66,14 +76,14 @@ class Settings(BaseSettings):
     # Helpers convenientes
     # ---------------------------
     @property
-    def platforms(self) -> List[str]:
-        """Lista de plataformas activas a partir del CSV PLATFORMS_ENABLED."""
-        return [s.strip() for s in self.PLATFORMS_ENABLED.split(",") if s.strip()]
+    def platforms(self) -> Tuple[str, ...]:
+        """Plataformas activas a partir del CSV PLATFORMS_ENABLED."""
+        return _split_csv(self.PLATFORMS_ENABLED)
 
     @property
-    def DAILY_SLOTS(self) -> List[str]:
-        """Convierte SLOTS_LOCAL (CSV) en lista de horas HH:MM."""
-        return [s.strip() for s in self.SLOTS_LOCAL.split(",") if s.strip()]
+    def DAILY_SLOTS(self) -> Tuple[str, ...]:
+        """Convierte SLOTS_LOCAL (CSV) en horas HH:MM."""
+        return _split_csv(self.SLOTS_LOCAL)
 
 
 # instancia global
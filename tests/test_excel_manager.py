@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from db import DB
+from excel_manager import ExcelManager
+
+
+def _write_tracks(path):
+    pd.DataFrame({
+        "Title": ["a", "b", "c"],
+        "YouTubeURL": ["https://youtu.be/aaaaaaa", "https://youtu.be/bbbbbbb", "https://youtu.be/ccccccc"],
+        "ReleaseDate": ["2026-01-01", "2026-01-02", "2026-01-03"],
+    }).to_excel(path, sheet_name="Tracks", index=False)
+
+
+def test_post_state_mixed_iso_shapes_keep_cooldown(tmp_path):
+    # isoformat() sin microsegundos en una fila y con microsegundos en otra
+    xlsx = tmp_path / "tracks.xlsx"
+    _write_tracks(xlsx)
+    db = DB(str(tmp_path / "xbot.db"))
+    now = datetime.now(timezone.utc)
+
+    em = ExcelManager(xlsx, "Tracks", db=db)
+    em.load()
+    em.mark_posted(0, now.replace(microsecond=0) - timedelta(days=1))
+    em.mark_posted(1, now.replace(microsecond=123456) - timedelta(days=2))
+
+    reloaded = ExcelManager(xlsx, "Tracks", db=db)
+    df = reloaded.load()
+    assert df.loc[:1, "LastPostedAt"].notna().all()
+    assert (df.loc[:1, "_last_posted_epoch"] > 0).all()
+
+    pool = reloaded.eligible_pool(now)
+    assert list(pool["YouTubeURL"]) == ["https://youtu.be/ccccccc"]
@@ -0,0 +1,66 @@
+from urllib.parse import parse_qsl
+
+from x_client import FastOAuth1
+
+
+def _header_params(header: str) -> dict:
+    assert header.startswith("OAuth ")
+    return {k: v.strip('"') for k, v in (p.strip().split("=", 1) for p in header[6:].split(","))}
+
+
+def test_rfc5849_base_string():
+    # RFC 5849 §3.4.1.1 (sin oauth_version, como en el ejemplo)
+    params = [
+        ("oauth_consumer_key", "9djdj82h48djs9d2"),
+        ("oauth_token", "kkk9d7dh3k39sjv7"),
+        ("oauth_signature_method", "HMAC-SHA1"),
+        ("oauth_timestamp", "137131201"),
+        ("oauth_nonce", "7d8f3e4a"),
+        *parse_qsl("c2&a3=2+q", keep_blank_values=True),
+    ]
+    base = FastOAuth1.signature_base_string(
+        "POST", "http://example.com/request?b5=%3D%253D&a3=a&c%40=&a2=r%20b", params
+    )
+    assert base == (
+        "POST&http%3A%2F%2Fexample.com%2Frequest&a2%3Dr%2520b%26a3%3D2%2520q"
+        "%26a3%3Da%26b5%3D%253D%25253D%26c%2540%3D%26c2%3D%26oauth_consumer_"
+        "key%3D9djdj82h48djs9d2%26oauth_nonce%3D7d8f3e4a%26oauth_signature_m"
+        "ethod%3DHMAC-SHA1%26oauth_timestamp%3D137131201%26oauth_token%3Dkkk"
+        "9d7dh3k39sjv7"
+    )
+
+
+def test_rfc5849_signature():
+    # RFC 5849 §1.2 (photos.example.net)
+    auth = FastOAuth1("dpf43f3p2l4k3l03", "kd94hf93k423kf44", "nnch734d00sl2jdk", "pfkkdhi9sl3r4s00", version=None)
+    url = "http://photos.example.net/photos?file=vacation.jpg&size=original"
+    header = auth.authorization("GET", url, nonce="chapoH", timestamp="137131202")
+    assert _header_params(header)["oauth_signature"] == "MdpQcU8iPSUjWoN%2FUDMsK2sui9I%3D"
+
+
+def test_x_docs_signature():
+    # Ejemplo de "Creating a signature" de la documentación de X
+    auth = FastOAuth1(
+        "xvz1evFS4wEEPTGEFPHBog",
+        "kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw",
+        "370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb",
+        "LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE",
+    )
+    url = "https://api.twitter.com/1.1/statuses/update.json?include_entities=true"
+    body = [("status", "Hello Ladies + Gentlemen, a signed OAuth request!")]
+    nonce, ts = "kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg", "1318622958"
+    header = auth.authorization("POST", url, body, nonce=nonce, timestamp=ts)
+    assert _header_params(header)["oauth_signature"] == "hCtSmYh%2BiHYCEqBWrE7C7hYmtUk%3D"
+
+
+def test_default_port_is_stripped():
+    params = [("oauth_nonce", "n")]
+    assert FastOAuth1.signature_base_string("POST", "https://API.x.com:443/2/tweets", params) == (
+        FastOAuth1.signature_base_string("POST", "https://api.x.com/2/tweets", params)
+    )
+    assert "example.com%3A8080" in FastOAuth1.signature_base_string("GET", "http://example.com:8080/r", params)
+
+
+def test_empty_token_is_not_signed():
+    header = FastOAuth1("ck", "cs", "", "").authorization("POST", "https://api.x.com/2/tweets")
+    assert "oauth_token" not in _header_params(header)
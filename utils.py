@@ -1,8 +1,13 @@
 import json, logging, re, unicodedata
-from urllib.parse import urlparse, urlencode, urlunparse, parse_qsl
+from urllib.parse import quote_plus, urlsplit, urlunsplit, urlencode, parse_qsl
 from datetime import datetime
 import random
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ---------- Logger JSON ----------
 class JSONLogger:
     def __init__(self, name: str, level: str = "INFO"):
@@ -14,31 +19,82 @@ class JSONLogger:
         if not self.logger.handlers:
             self.logger.addHandler(handler)
 
-    def log(self, **kwargs):
-        # imprime JSON en una línea (apto para Render/Railway)
-        self.logger.info(json.dumps(kwargs, ensure_ascii=False))
+    def _emit(self, level: int, kwargs: dict):
+        # Si el nivel está filtrado no se serializa nada
+        if not self.logger.isEnabledFor(level):
+            return
+        # imprime JSON en una línea (apto para Render/Railway); orjson ya emite UTF-8 sin escapar
+        if orjson is not None:
+            self.logger.log(level, orjson.dumps(kwargs).decode())
+        else:
+            self.logger.log(level, json.dumps(kwargs, ensure_ascii=False))
+
+    def debug(self, **kwargs):
+        self._emit(logging.DEBUG, kwargs)
+
+    def info(self, **kwargs):
+        self._emit(logging.INFO, kwargs)
+
+    def warning(self, **kwargs):
+        self._emit(logging.WARNING, kwargs)
+
+    # nivel INFO, como siempre
+    log = info
 
-log = JSONLogger("x-bot").log
+json_logger = JSONLogger("x-bot")
+log = json_logger.log
+
+# ---------- Motor de lectura Excel ----------
+# calamine (Rust) parsea XLSX en streaming, sin construir el DOM de openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READ_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READ_ENGINE = "openpyxl"
+
+# xlsxwriter sólo escribe (no edita): se usa para reescribir libros de una sola hoja
+try:
+    import xlsxwriter  # noqa: F401
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
 
 # ---------- Validaciones y utilidades ----------
-_YT_RE = re.compile(r"^(https?://)?(www\.)?(youtube\.com|youtu\.be)/", re.IGNORECASE)
+# Prefijos aceptados (en minúsculas): [http(s)://][www.](youtube.com|youtu.be)/
+# Público para poder usarlo también vectorizado (Series.str.startswith)
+YT_URL_PREFIXES = tuple(
+    f"{scheme}{www}{host}/"
+    for scheme in ("", "http://", "https://")
+    for www in ("", "www.")
+    for host in ("youtube.com", "youtu.be")
+)
 
 def is_valid_youtube(url: str) -> bool:
-    return bool(url and _YT_RE.match(url.strip()))
+    return bool(url and url.strip().lower().startswith(YT_URL_PREFIXES))
+
+# Todo ASCII no alfanumérico -> "-" (tras NFKD+ascii sólo queda ASCII)
+_SLUG_TABLE = str.maketrans({c: "-" for c in map(chr, range(128)) if not c.isalnum()})
+_DASHES_RE = re.compile(r"-{2,}")
 
 def slugify(text: str) -> str:
-    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
-    text = re.sub(r"[^a-zA-Z0-9]+", "-", text).strip("-").lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    text = _DASHES_RE.sub("-", text.translate(_SLUG_TABLE)).strip("-").lower()
     return text[:60] or "track"
 
+_UTM_KEYS = ("utm_source", "utm_medium", "utm_campaign")
+
 def add_utm(url: str, source: str, medium: str, campaign: str) -> str:
     if not url:
         return url
-    parts = list(urlparse(url))
-    q = dict(parse_qsl(parts[4]))
-    q.update({"utm_source": source, "utm_medium": medium, "utm_campaign": campaign})
-    parts[4] = urlencode(q)
-    return urlunparse(parts)
+    values = (source, medium, campaign)
+    # Caso común (sin query ni fragmento): basta con concatenar
+    if "?" not in url and "#" not in url:
+        return url + "?" + "&".join(f"{k}={quote_plus(v)}" for k, v in zip(_UTM_KEYS, values))
+    parts = urlsplit(url)
+    q = dict(parse_qsl(parts.query))
+    q.update(zip(_UTM_KEYS, values))
+    return urlunsplit(parts._replace(query=urlencode(q)))
 
 def fmt_date_ddmmyyyy(dt: datetime) -> str:
     return dt.strftime("%d/%m/%Y")
@@ -1,21 +1,228 @@
 # x_client.py
 from __future__ import annotations
 
+import base64
+import hashlib
+import hmac
+import json
 import logging
+import re
+import secrets
+import threading
 import time
-from typing import Optional, List
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Optional, List, Tuple
+from urllib.parse import parse_qsl, quote, urlsplit
 
 import requests
-from requests_oauthlib import OAuth1
-from urllib.parse import urlparse, parse_qs
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from urllib3.util.retry import Retry
 
 from settings import settings
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 API_BASE = "https://api.x.com/2"
 UPLOAD_BASE_V11 = "https://upload.twitter.com/1.1"
 
+# URLs fijas precalculadas
+_TWEETS_URL = f"{API_BASE}/tweets"
+_MEDIA_UPLOAD_URL = f"{UPLOAD_BASE_V11}/media/upload.json"
+_THUMB_TMPL = "https://img.youtube.com/vi/{vid}/{q}.jpg".format
+
+# Margen extra (tras la espera PRE-publicación) para que termine la miniatura antes de publicar sin ella
+THUMB_GRACE_SECONDS = 5
+
 logger = logging.getLogger("xbot")
 
+# ID de vídeo en youtu.be/<id>, youtube.com/watch?...v=<id>, /shorts/<id> y /embed/<id> (una sola pasada)
+_YT_ID_RE = re.compile(
+    r"(?:youtu\.be/|youtube\.com/(?:watch\?(?:[^#]*&)?v=|shorts/|embed/))([A-Za-z0-9_-]{6,})",
+    re.IGNORECASE,
+)
+
+
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Reintentos de POST ante 429/5xx: cada intento es una petición nueva (firma OAuth1 con nonce nuevo)
+_POST_MAX_RETRIES = 3
+_POST_BACKOFF_SECONDS = 1.0
+_RETRY_AFTER_MAX_SECONDS = 900  # ventana de rate limit de X (15 min)
+
+
+def _retry_delay(r: requests.Response, attempt: int) -> float:
+    """Segundos a esperar antes del siguiente intento: Retry-After si viene, si no backoff exponencial."""
+    value = r.headers.get("Retry-After")
+    if value:
+        try:
+            return min(max(float(value), 0.0), _RETRY_AFTER_MAX_SECONDS)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+                return min(max(delay, 0.0), _RETRY_AFTER_MAX_SECONDS)
+            except (TypeError, ValueError):
+                pass
+    return _POST_BACKOFF_SECONDS * 2 ** attempt
+
+
+def _build_session() -> requests.Session:
+    """Sesión compartida: keep-alive + pool de urllib3 (sin handshake TCP/TLS por petición)."""
+    session = requests.Session()
+    # El adaptador sólo reintenta GET (429/5xx respetando Retry-After, y timeouts de lectura).
+    # Un POST sólo se reintenta aquí si falla la conexión (no llegó a enviarse): reenviar tras un
+    # timeout de lectura podría publicar dos veces, y el PreparedRequest reenviado llevaría la misma
+    # firma OAuth1 (nonce repetido). Los 429/5xx de POST se reintentan en _post_with_retry.
+    # raise_on_status=False: agotados los reintentos se devuelve la última respuesta (raise_for_status decide)
+    retry = Retry(
+        total=5,
+        backoff_factor=1.0,
+        status_forcelist=_RETRY_STATUSES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+    session.headers.update({"User-Agent": "xbot/1.0"})
+    return session
+
+
+_SESSION = _build_session()
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _json_body(payload: dict) -> bytes:
+    # orjson serializa directamente a bytes (sin pasar por str + encode)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _pct(value: str) -> str:
+    # Percent-encoding de RFC 5849 (sólo A-Z a-z 0-9 - . _ ~ quedan sin codificar)
+    return quote(value, safe="~")
+
+
+class FastOAuth1(AuthBase):
+    """
+    Firma OAuth1 HMAC-SHA1 (user context, RFC 5849) para requests.
+    La clave HMAC (consumer_secret&token_secret) y los parámetros fijos se calculan una vez;
+    por petición sólo se generan nonce/timestamp y la firma.
+    """
+
+    def __init__(
+        self,
+        consumer_key: str,
+        consumer_secret: str,
+        token: str,
+        token_secret: str,
+        version: Optional[str] = "1.0",
+    ):
+        self._key = f"{_pct(consumer_secret)}&{_pct(token_secret)}".encode()
+        static = [("oauth_consumer_key", consumer_key), ("oauth_signature_method", "HMAC-SHA1")]
+        # oauth_token y oauth_version son opcionales: si no hay valor no se firman vacíos
+        if token:
+            static.append(("oauth_token", token))
+        if version:
+            static.append(("oauth_version", version))
+        self._static = tuple(static)
+
+    def __call__(self, r):
+        body_params = None
+        content_type = r.headers.get("Content-Type", "")
+        if isinstance(content_type, bytes):
+            content_type = content_type.decode()
+        # Sólo un cuerpo form-urlencoded entra en la firma (JSON y multipart no)
+        if r.body and content_type.startswith("application/x-www-form-urlencoded"):
+            body = r.body.decode() if isinstance(r.body, bytes) else r.body
+            body_params = parse_qsl(body, keep_blank_values=True)
+        r.headers["Authorization"] = self.authorization(r.method, r.url, body_params)
+        return r
+
+    @staticmethod
+    def signature_base_string(method: str, url: str, params: List[Tuple[str, str]]) -> str:
+        """Base string de RFC 5849 §3.4.1 (params: oauth_* + cuerpo form-urlencoded; la query sale de url)."""
+        u = urlsplit(url)
+        all_params = list(params) + parse_qsl(u.query, keep_blank_values=True)
+        normalized = "&".join(f"{k}={v}" for k, v in sorted((_pct(k), _pct(v)) for k, v in all_params))
+        # §3.4.1.2: esquema y host en minúsculas, sin userinfo y sin el puerto por defecto
+        scheme = u.scheme.lower()
+        host = (u.hostname or "").lower()
+        if u.port is not None and u.port != _DEFAULT_PORTS.get(scheme):
+            host = f"{host}:{u.port}"
+        base_url = f"{scheme}://{host}{u.path or '/'}"
+        return f"{method.upper()}&{_pct(base_url)}&{_pct(normalized)}"
+
+    def sign(self, base_string: str) -> str:
+        return base64.b64encode(hmac.new(self._key, base_string.encode(), hashlib.sha1).digest()).decode()
+
+    def authorization(
+        self,
+        method: str,
+        url: str,
+        body_params: Optional[List[Tuple[str, str]]] = None,
+        nonce: Optional[str] = None,
+        timestamp: Optional[str] = None,
+    ) -> str:
+        oauth = [
+            ("oauth_nonce", nonce or secrets.token_hex(16)),
+            ("oauth_timestamp", timestamp or str(int(time.time()))),
+            *self._static,
+        ]
+        base_string = self.signature_base_string(method, url, oauth + (body_params or []))
+        oauth.append(("oauth_signature", self.sign(base_string)))
+        return "OAuth " + ", ".join(f'{k}="{_pct(v)}"' for k, v in oauth)
+
+
+# Miniaturas ya descargadas: (vid, quality) -> (validadores HTTP, bytes, content-type), LRU acotada
+_THUMB_CACHE_MAX = 64
+_thumb_cache: "OrderedDict[Tuple[str, str], Tuple[dict, bytes, str]]" = OrderedDict()
+_thumb_lock = threading.Lock()
+
+
+def _fetch_thumb(vid: str, quality: str) -> Tuple[bytes, str]:
+    """
+    Descarga la miniatura de YouTube. Si ya está en caché se revalida con un GET condicional
+    (If-None-Match / If-Modified-Since): un 304 reutiliza los bytes guardados.
+    Los fallos lanzan excepción, así que no quedan en caché.
+    """
+    key = (vid, quality)
+    with _thumb_lock:
+        cached = _thumb_cache.get(key)
+    if cached is not None and not cached[0]:
+        # Sin validadores no hay GET condicional posible: se sirve la copia local
+        return cached[1], cached[2]
+
+    img = _SESSION.get(_THUMB_TMPL(vid=vid, q=quality), headers=cached[0] if cached else None, timeout=15)
+    if img.status_code == 304 and cached is not None:
+        with _thumb_lock:
+            if key in _thumb_cache:
+                _thumb_cache.move_to_end(key)
+        return cached[1], cached[2]
+    img.raise_for_status()
+
+    validators = {}
+    if img.headers.get("ETag"):
+        validators["If-None-Match"] = img.headers["ETag"]
+    if img.headers.get("Last-Modified"):
+        validators["If-Modified-Since"] = img.headers["Last-Modified"]
+    content_type = img.headers.get("Content-Type", "image/jpeg")
+    with _thumb_lock:
+        _thumb_cache[key] = (validators, img.content, content_type)
+        _thumb_cache.move_to_end(key)
+        if len(_thumb_cache) > _THUMB_CACHE_MAX:
+            _thumb_cache.popitem(last=False)
+    return img.content, content_type
+
 
 class XClient:
     """
@@ -26,11 +233,20 @@ class XClient:
     - Opcional: subir miniatura de YouTube si ATTACH_THUMBNAIL=true (requiere OAuth1 para media v1.1).
     """
 
+    def __init__(self):
+        # api.x.com, upload.twitter.com e img.youtube.com reutilizan conexiones
+        self._session = _SESSION
+        # Firmador OAuth1 construido una vez (clave HMAC precalculada; nonce/timestamp nuevos por petición)
+        self._oauth1 = self._oauth1_auth()
+        self._oauth2_hdrs = self._oauth2_headers()
+        # La miniatura se prepara en paralelo con la espera PRE-publicación (ver publish)
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xbot-thumb")
+
     # ---------------------------
     # Autenticación
     # ---------------------------
-    def _oauth1_auth(self) -> OAuth1:
-        return OAuth1(
+    def _oauth1_auth(self) -> FastOAuth1:
+        return FastOAuth1(
             settings.X_API_KEY,
             settings.X_API_SECRET,
             settings.X_ACCESS_TOKEN,
@@ -55,26 +271,83 @@ class XClient:
         payload: dict = {"text": text}
         if media_ids:
             payload["media"] = {"media_ids": media_ids}
+        # Modo simulación: sale antes de la espera
+        if settings.DRY_RUN:
+            return self._dry_run_post(payload)
+
+        self._preview_wait()
+        return self._create_post(payload)
+
+    def post_texts(self, texts: List[str]) -> List[dict]:
+        """
+        Publica varios tweets de texto seguidos: una sola espera PRE-publicación para todo
+        el lote y los POST reutilizan la misma conexión de la sesión.
+        """
+        if settings.DRY_RUN:
+            return [self._dry_run_post({"text": text}) for text in texts]
+        self._preview_wait()
+        return [self._create_post({"text": text}) for text in texts]
+
+    def publish(self, text: str, url: str, platform: str) -> dict:
+        """
+        Como post_text, pero la miniatura (descarga + subida) se prepara en segundo plano
+        mientras transcurre la espera PRE-publicación, en vez de antes de ella.
+        """
+        if settings.DRY_RUN:
+            # Sin espera que solapar: la miniatura (simulada) se prepara en línea
+            return self.post_text(text, media_ids=self.prepare_thumbnail_if_enabled(url, platform))
+
+        fut = self._exec.submit(self.prepare_thumbnail_if_enabled, url, platform)
+        self._preview_wait()
+        try:
+            media_ids = fut.result(timeout=THUMB_GRACE_SECONDS)
+        except FuturesTimeoutError:
+            # Fail-open: se publica sin miniatura
+            logger.warning({"event": "thumb_timeout", "seconds": THUMB_GRACE_SECONDS})
+            media_ids = None
+
+        payload: dict = {"text": text}
+        if media_ids:
+            payload["media"] = {"media_ids": media_ids}
+        return self._create_post(payload)
 
+    def _preview_wait(self) -> None:
         # Espera PRE-publicación (tras escribir el texto y pegar el enlace)
-        if not settings.DRY_RUN and settings.PREVIEW_WAIT_SECONDS > 0:
-            logger.info(
-                {"event": "pre_publish_wait", "seconds": settings.PREVIEW_WAIT_SECONDS}
-            )
+        if settings.PREVIEW_WAIT_SECONDS > 0:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info({"event": "pre_publish_wait", "seconds": settings.PREVIEW_WAIT_SECONDS})
             time.sleep(settings.PREVIEW_WAIT_SECONDS)
 
-        # Modo simulación (no publica)
-        if settings.DRY_RUN:
+    @staticmethod
+    def _dry_run_post(payload: dict) -> dict:
+        # Modo simulación (no publica). El dict de log sólo se construye si INFO está activo
+        if logger.isEnabledFor(logging.INFO):
             logger.info({"event": "dry_run_create_post", "payload": payload})
-            return {"dry_run": True, "payload": payload}
+        return {"dry_run": True, "payload": payload}
 
-        url = f"{API_BASE}/tweets"
+    def _post_with_retry(self, url: str, **kwargs) -> requests.Response:
+        """
+        POST con reintentos ante 429/5xx (respetando Retry-After), sin repetir la espera PRE-publicación.
+        Cada intento pasa de nuevo por session.post, así que FastOAuth1 firma con nonce/timestamp nuevos.
+        Los timeouts de lectura no se reintentan: el tweet podría haberse publicado ya.
+        """
+        for attempt in range(_POST_MAX_RETRIES + 1):
+            r = self._session.post(url, **kwargs)
+            if r.status_code not in _RETRY_STATUSES or attempt == _POST_MAX_RETRIES:
+                return r
+            delay = _retry_delay(r, attempt)
+            logger.warning({"event": "x_api_retry", "status": r.status_code, "attempt": attempt + 1, "delay": delay})
+            time.sleep(delay)
+        return r
+
+    def _create_post(self, payload: dict) -> dict:
+        body = _json_body(payload)
         if settings.X_AUTH_METHOD.lower() == "oauth1":
-            r = requests.post(url, json=payload, auth=self._oauth1_auth(), timeout=20)
+            r = self._post_with_retry(_TWEETS_URL, data=body, headers=_JSON_HEADERS, auth=self._oauth1, timeout=20)
         else:
-            r = requests.post(url, json=payload, headers=self._oauth2_headers(), timeout=20)
+            r = self._post_with_retry(_TWEETS_URL, data=body, headers=self._oauth2_hdrs, timeout=20)
 
-        if r.status_code >= 400:
+        if r.status_code >= 400 and logger.isEnabledFor(logging.ERROR):
             logger.error({"event": "x_api_error", "status": r.status_code, "body": r.text})
         r.raise_for_status()
         return r.json()
@@ -98,12 +371,12 @@ class XClient:
             return None
 
         quality = getattr(settings, "THUMBNAIL_QUALITY", "hqdefault")
-        thumb_url = f"https://img.youtube.com/vi/{vid}/{quality}.jpg"
         try:
-            img = requests.get(thumb_url, timeout=15)
-            if not img.ok:
-                logger.warning({"event": "thumb_fetch_failed", "status": img.status_code})
-                return None
+            # Reintentos/reposts del mismo vídeo sólo revalidan la imagen (304 sin cuerpo)
+            content, content_type = _fetch_thumb(vid, quality)
+        except requests.HTTPError as e:
+            logger.warning({"event": "thumb_fetch_failed", "status": e.response.status_code})
+            return None
         except Exception as e:
             logger.warning({"event": "thumb_fetch_exception", "error": str(e)})
             return None
@@ -119,7 +392,7 @@ class XClient:
             return None
 
         try:
-            media_id = self._upload_image_v11(img.content, img.headers.get("Content-Type", "image/jpeg"))
+            media_id = self._upload_image_v11(content, content_type)
             return [media_id] if media_id else None
         except Exception as e:
             logger.warning({"event": "thumb_upload_failed", "error": str(e)})
@@ -129,17 +402,8 @@ class XClient:
     # Helpers YouTube
     # ---------------------------
     def _extract_yt_id(self, url: str) -> Optional[str]:
-        u = urlparse(url)
-        if u.netloc in ("youtu.be", "www.youtu.be"):
-            return u.path.lstrip("/") or None
-        if "youtube.com" in u.netloc:
-            if u.path == "/watch":
-                return parse_qs(u.query).get("v", [None])[0]
-            for prefix in ("/shorts/", "/embed/"):
-                if u.path.startswith(prefix):
-                    parts = u.path.split("/")
-                    return parts[2] if len(parts) > 2 else None
-        return None
+        m = _YT_ID_RE.search(url)
+        return m.group(1) if m else None
 
     # ---------------------------
     # Subida de imágenes (v1.1)
@@ -153,10 +417,8 @@ class XClient:
             logger.info({"event": "dry_run_media_upload"})
             return "0"
 
-        url = f"{UPLOAD_BASE_V11}/media/upload.json"
         files = {"media": ("thumb.jpg", image_bytes, media_type)}
-        auth = self._oauth1_auth()
-        r = requests.post(url, files=files, auth=auth, timeout=30)
+        r = self._post_with_retry(_MEDIA_UPLOAD_URL, files=files, auth=self._oauth1, timeout=30)
         r.raise_for_status()
         data = r.json()
         media_id = data.get("media_id_string") or data.get("media_id")